@@ -8,10 +8,11 @@ from .interfaces import (
     IMessageCollector, IMessageFilter, IStyleAnalyzer, ILearningStrategy, 
     IQualityMonitor, IPersonaManager, IPersonaUpdater, IPersonaBackupManager, 
     IDataStorage, IObserver, IEventPublisher, IServiceFactory, IAsyncService, 
-    IMLAnalyzer, IIntelligentResponder, ServiceLifecycle, MessageData, 
-    AnalysisResult, LearningStrategyType, AnalysisType, EventType, 
+    IMLAnalyzer, IIntelligentResponder, ServiceLifecycle, MessageData, MessageBatch, 
+    AnalysisResult, LearningStrategyType, AnalysisType, EventType
+)
+from ..exceptions import (
     ServiceError, StyleAnalysisError, ConfigurationError, DataStorageError, PersonaUpdateError
-
 )
 
 __all__ = [
@@ -41,6 +42,7 @@ __all__ = [
     'IIntelligentResponder',
     'ServiceLifecycle',
     'MessageData',
+    'MessageBatch',
     'AnalysisResult',
     'LearningStrategyType',
     'AnalysisType',
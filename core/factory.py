@@ -1,7 +1,8 @@
 """
 服务工厂 - 工厂模式实现，避免循环导入
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
 import asyncio
 import json # 导入json模块，因为MessageFilter中使用了
 
@@ -488,12 +489,23 @@ class QQFilter:
 
 
 class MessageFilter:
+    _CACHE_MAXSIZE = 4096  # LLM 筛选结果缓存的最大条目数
+    
     def __init__(self, config: PluginConfig, context: Context, llm_client: LLMClient, prompts: Any):
         self.config = config
         self.context = context
         self.llm_client = llm_client
         self.prompts = prompts  # 保存 prompts
         self._logger = logger
+        # (人格, 消息) -> (suitable, confidence)，重复的短消息直接命中，跳过 LLM 调用
+        self._filter_cache: "OrderedDict[Tuple[str, str], Tuple[bool, float]]" = OrderedDict()
+    
+    def _cache_filter_result(self, key: Tuple[str, str], result: Tuple[bool, float]):
+        """写入筛选结果缓存，超出容量时淘汰最久未使用的条目"""
+        self._filter_cache[key] = result
+        self._filter_cache.move_to_end(key)
+        if len(self._filter_cache) > self._CACHE_MAXSIZE:
+            self._filter_cache.popitem(last=False)
     
     async def is_suitable_for_learning(self, message: str) -> bool:
         # 基础长度检查
@@ -510,6 +522,14 @@ class MessageFilter:
         try:
             current_persona = self.context.get_using_provider().curr_personality.prompt if self.context.get_using_provider() else "默认人格"
             
+            # 相同人格下相同消息的筛选结果可直接复用
+            cache_key = (current_persona, message)
+            cached = self._filter_cache.get(cache_key)
+            if cached is not None:
+                self._filter_cache.move_to_end(cache_key)
+                suitable, confidence = cached
+                return suitable and confidence >= self.config.confidence_threshold
+            
             prompt = self.prompts.MESSAGE_FILTER_SUITABLE_FOR_LEARNING_PROMPT.format(
                 current_persona=current_persona,
                 message=message
@@ -525,19 +545,17 @@ class MessageFilter:
             )
             
             if response and response.get('text'):
-                # 使用安全的JSON解析
-                default_result = {
-                    'suitable': False,
-                    'confidence': 0.0
-                }
-                
-                llm_result = safe_parse_llm_json(response['text'], fallback_result=default_result)
+                # 使用安全的JSON解析，解析失败时返回 None，避免把默认结果写入缓存
+                llm_result = safe_parse_llm_json(response['text'], fallback_result=None)
                 
                 if llm_result and isinstance(llm_result, dict):
                     suitable = llm_result.get('suitable', False)
                     confidence = llm_result.get('confidence', 0.0)
                     
                     self._logger.debug(f"LLM 筛选结果: message='{message}', suitable={suitable}, confidence={confidence}")
+                    # 只缓存字段完整的有效判定，残缺结果下次重新询问 LLM
+                    if 'suitable' in llm_result and 'confidence' in llm_result:
+                        self._cache_filter_result(cache_key, (suitable, confidence))
                     
                     # 结合置信度阈值进行判断
                     return suitable and confidence >= self.config.confidence_threshold
@@ -2,16 +2,24 @@
 插件核心接口定义 - 抽象接口和协议
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Protocol
+from typing import Dict, List, Optional, Any, Protocol, Sequence, Mapping, TYPE_CHECKING
 from dataclasses import dataclass
+from types import MappingProxyType
 from enum import Enum
 
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api.star import Context
 
+if TYPE_CHECKING:
+    import numpy as np
+    from ..exceptions import (
+        SelfLearningError, ConfigurationError, DataStorageError, MessageCollectionError,
+        StyleAnalysisError, PersonaUpdateError, ModelAccessError, LearningSchedulerError, ServiceError
+    )
 
-class ServiceLifecycle(Enum):
-    """服务生命周期状态"""
+
+class ServiceLifecycle(str, Enum):
+    """服务生命周期状态（成员本身即字符串，可与字符串值直接比较和互作字典键）"""
     CREATED = "created"
     INITIALIZING = "initializing"
     RUNNING = "running"
@@ -20,7 +28,7 @@ class ServiceLifecycle(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MessageData:
     """标准化消息数据结构"""
     sender_id: str
@@ -33,15 +41,51 @@ class MessageData:
     reply_to: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
+class MessageBatch:
+    """按列存储的消息批次，供批量分析时只扫描需要的列"""
+    sender_ids: List[str]
+    sender_names: List[str]
+    messages: List[str]
+    group_ids: List[str]
+    timestamps: 'np.ndarray'  # float64
+    platforms: List[str]
+    message_ids: List[Optional[str]]
+    reply_tos: List[Optional[str]]
+
+    @classmethod
+    def from_records(cls, records: Sequence[MessageData]) -> 'MessageBatch':
+        """由消息记录列表一次性构建各列"""
+        import numpy as np  # 仅在构建批次时加载
+        
+        return cls(
+            sender_ids=[r.sender_id for r in records],
+            sender_names=[r.sender_name for r in records],
+            messages=[r.message for r in records],
+            group_ids=[r.group_id for r in records],
+            timestamps=np.fromiter((r.timestamp for r in records), dtype=np.float64, count=len(records)),
+            platforms=[r.platform for r in records],
+            message_ids=[r.message_id for r in records],
+            reply_tos=[r.reply_to for r in records]
+        )
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+
+@dataclass(slots=True)
 class AnalysisResult:
-    """分析结果基础结构"""
+    """分析结果基础结构，data 以只读视图保存，使用方可直接读取而无需防御性拷贝"""
     success: bool
     confidence: float
-    data: Dict[str, Any]
+    data: Mapping[str, Any]
     timestamp: float = 0.0
     error: Optional[str] = None
 
+    def __post_init__(self):
+        if not isinstance(self.data, MappingProxyType):
+            self.data = MappingProxyType(self.data)
+
 
 @dataclass
 class PersonaUpdateRecord:
@@ -71,6 +115,11 @@ class IMessageCollector(ABC):
         """获取未处理的消息"""
         pass
     
+    @abstractmethod
+    async def add_filtered_message(self, filtered_data: Dict[str, Any]) -> int:
+        """添加筛选后的消息，返回筛选消息ID"""
+        pass
+    
     @abstractmethod
     async def mark_messages_processed(self, message_ids: List[str]) -> bool:
         """标记消息为已处理"""
@@ -83,7 +132,10 @@ class IMessageCollector(ABC):
 
 
 class IMessageFilter(ABC):
-    """消息过滤器接口"""
+    """消息过滤器接口
+    
+    实现的结果应只取决于消息内容（及当前人格），不应有副作用，以便调用结果可以被缓存复用。
+    """
     
     @abstractmethod
     async def filter_message(self, message: str) -> AnalysisResult:
@@ -105,7 +157,7 @@ class IStyleAnalyzer(ABC):
         pass
     
     @abstractmethod
-    async def compare_styles(self, style1: Dict[str, Any], style2: Dict[str, Any]) -> float:
+    async def compare_styles(self, style1: Mapping[str, Any], style2: Mapping[str, Any]) -> float:
         """比较风格相似度"""
         pass
 
@@ -393,7 +445,7 @@ class IIntelligentResponder(ABC):
 
 
 # 策略枚举
-class LearningStrategyType(Enum):
+class LearningStrategyType(str, Enum):
     """学习策略类型"""
     PROGRESSIVE = "progressive"
     BATCH = "batch"
@@ -401,7 +453,7 @@ class LearningStrategyType(Enum):
     HYBRID = "hybrid"
 
 
-class AnalysisType(Enum):
+class AnalysisType(str, Enum):
     """分析类型"""
     STYLE = "style"
     SENTIMENT = "sentiment"
@@ -410,7 +462,7 @@ class AnalysisType(Enum):
     QUALITY = "quality"
 
 
-class EventType(Enum):
+class EventType(str, Enum):
     """事件类型"""
     MESSAGE_COLLECTED = "message_collected"
     MESSAGE_FILTERED = "message_filtered"
@@ -421,5 +473,17 @@ class EventType(Enum):
     SERVICE_STATUS_CHANGED = "service_status_changed"
 
 
-# 异常类型 (从 exceptions.py 导入，避免重复定义)
-from ..exceptions import SelfLearningError, ConfigurationError, DataStorageError, MessageCollectionError, StyleAnalysisError, PersonaUpdateError, ModelAccessError, LearningSchedulerError, ServiceError
+# 异常类型 (从 exceptions.py 按需导入，避免重复定义；保留 from core.interfaces import XxxError 的用法)
+_EXCEPTION_NAMES = frozenset((
+    'SelfLearningError', 'ConfigurationError', 'DataStorageError', 'MessageCollectionError',
+    'StyleAnalysisError', 'PersonaUpdateError', 'ModelAccessError', 'LearningSchedulerError', 'ServiceError'
+))
+
+
+def __getattr__(name: str):
+    if name in _EXCEPTION_NAMES:
+        from .. import exceptions
+        value = getattr(exceptions, name)
+        globals()[name] = value  # 缓存，后续访问不再经过 __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
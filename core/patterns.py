@@ -11,8 +11,9 @@ from .interfaces import (
     IObserver, IEventPublisher, IServiceFactory, ILearningStrategy, 
     IAsyncService, ServiceLifecycle, EventType, LearningStrategyType,
     MessageData, AnalysisResult, IMessageCollector, IStyleAnalyzer,
-    IQualityMonitor, IPersonaManager, ServiceError
+    IQualityMonitor, IPersonaManager
 )
+from ..exceptions import ServiceError
 
 
 class SingletonABCMeta(abc.ABCMeta):
@@ -30,41 +31,47 @@ class EventBus(IEventPublisher, metaclass=SingletonABCMeta):
     
     def __init__(self):
         self._observers: Dict[str, List[IObserver]] = {}
+        self._snapshots: Dict[str, tuple] = {}  # 按事件类型缓存的观察者快照，订阅变更时失效
         self._logger = logger
     
     def subscribe(self, event_type: str, observer: IObserver) -> None:
         """订阅事件"""
-        if event_type not in self._observers:
-            self._observers[event_type] = []
+        observers = self._observers.setdefault(event_type, [])
         
-        if observer not in self._observers[event_type]:
-            self._observers[event_type].append(observer)
+        if observer not in observers:
+            observers.append(observer)
+            self._snapshots.pop(event_type, None)
             self._logger.debug(f"订阅事件 {event_type}: {observer.__class__.__name__}")
     
     def unsubscribe(self, event_type: str, observer: IObserver) -> None:
         """取消订阅"""
         if event_type in self._observers and observer in self._observers[event_type]:
             self._observers[event_type].remove(observer)
+            self._snapshots.pop(event_type, None)
             self._logger.debug(f"取消订阅事件 {event_type}: {observer.__class__.__name__}")
     
     async def publish_event(self, event_type: str, data: Dict[str, Any]) -> None:
         """发布事件"""
-        if event_type not in self._observers:
+        observers = self._snapshots.get(event_type)
+        if observers is None:
+            observers = tuple(self._observers.get(event_type, ()))
+            self._snapshots[event_type] = observers
+        
+        if not observers:
             return
         
-        self._logger.debug(f"发布事件 {event_type}, 观察者数量: {len(self._observers[event_type])}")
+        self._logger.debug(f"发布事件 {event_type}, 观察者数量: {len(observers)}")
         
-        # 并发通知所有观察者
-        tasks = []
-        for observer in self._observers[event_type]:
+        # 并发通知所有观察者（遍历快照，通知期间的订阅变更不影响本次分发）
+        coros = []
+        for observer in observers:
             try:
-                task = asyncio.create_task(observer.on_event(event_type, data))
-                tasks.append(task)
+                coros.append(observer.on_event(event_type, data))
             except Exception as e:
                 self._logger.error(f"通知观察者失败: {e}")
         
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        if coros:
+            await asyncio.gather(*coros, return_exceptions=True)
 
 
 class AsyncServiceBase(IAsyncService):
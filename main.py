@@ -555,8 +555,8 @@ class SelfLearningPlugin(star.Star):
             filename = FileNames.EXPORT_FILENAME_TEMPLATE.format(timestamp=timestamp)
             filepath = os.path.join(self.plugin_config.data_dir, filename)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+            with open(filepath, 'wb') as f:
+                f.write(export_data)
                 
             yield event.plain_result(CommandMessages.DATA_EXPORTED.format(filepath=filepath))
             
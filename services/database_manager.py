@@ -3,11 +3,14 @@
 """
 import os
 import json
+import asyncio
 import aiosqlite
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from datetime import datetime
 
+import numpy as np
+
 from astrbot.api import logger
 
 from ..config import PluginConfig
@@ -27,6 +30,14 @@ class DatabaseManager(AsyncServiceBase):
         self.messages_db_path = config.messages_db_path
         self.messages_db_connection: Optional[aiosqlite.Connection] = None
         
+        # 已处理标记的合并写入：短时间窗口内的多次标记合并为一次 UPDATE
+        self._processed_flush_delay = 0.05
+        self._pending_processed_ids: set = set()
+        self._processed_waiters: List[asyncio.Future] = []
+        self._processed_flush_handle: Optional[asyncio.TimerHandle] = None
+        self._processed_flush_task: Optional[asyncio.Task] = None
+        self._processed_flush_lock = asyncio.Lock()
+        
         # 确保数据目录存在
         os.makedirs(self.group_data_dir, exist_ok=True)
         
@@ -55,8 +66,16 @@ class DatabaseManager(AsyncServiceBase):
     async def close_all_connections(self):
         """关闭所有数据库连接"""
         try:
-            # 关闭全局消息数据库连接
+            # 关闭全局消息数据库连接（先写入尚未落库的已处理标记）
             if self.messages_db_connection:
+                # 等待已在进行的后台写入完成，其结果已交给各等待者
+                if self._processed_flush_task is not None:
+                    await self._processed_flush_task
+                    self._processed_flush_task = None
+                try:
+                    await self._flush_processed_ids()
+                except DataStorageError:
+                    pass  # 错误已记录
                 await self.messages_db_connection.close()
                 self.messages_db_connection = None
                 self._logger.info("全局消息数据库连接已关闭")
@@ -81,11 +100,28 @@ class DatabaseManager(AsyncServiceBase):
         if self.messages_db_connection is None:
             # 确保目录存在
             os.makedirs(os.path.dirname(self.messages_db_path), exist_ok=True)
-            self.messages_db_connection = await aiosqlite.connect(self.messages_db_path)
+            # 提高语句缓存容量，固定文本的SQL只需编译一次
+            self.messages_db_connection = await aiosqlite.connect(self.messages_db_path, cached_statements=256)
+            await self._configure_messages_db_connection(self.messages_db_connection)
             # 首次连接时，确保数据库表被初始化
             await self._init_messages_database_tables(self.messages_db_connection)
         return self.messages_db_connection
 
+    async def _configure_messages_db_connection(self, conn: aiosqlite.Connection):
+        """
+        为全局消息数据库连接设置写入性能相关的 PRAGMA（每个连接执行一次）。
+        
+        WAL + synchronous=NORMAL 使每次提交只需一次 fsync，且读操作不再被写操作阻塞；
+        代价是操作系统崩溃或断电时可能丢失最后提交的事务，但数据库本身保持一致。
+        """
+        await conn.execute('PRAGMA journal_mode=WAL')
+        await conn.execute('PRAGMA synchronous=NORMAL')
+        await conn.execute('PRAGMA temp_store=MEMORY')
+        await conn.execute('PRAGMA mmap_size=268435456')  # 256MB
+        await conn.execute('PRAGMA cache_size=-65536')  # 64MB
+        await conn.execute('PRAGMA wal_autocheckpoint=1000')
+        await conn.execute('PRAGMA journal_size_limit=67108864')  # 检查点后将 WAL 文件截断到 64MB 以内
+
     async def _init_messages_database(self):
         """
         此方法现在仅作为 _do_start 的入口，实际的表创建逻辑已移至 _init_messages_database_tables。
@@ -189,6 +225,7 @@ class DatabaseManager(AsyncServiceBase):
             await cursor.execute('CREATE INDEX IF NOT EXISTS idx_raw_messages_processed ON raw_messages(processed)')
             await cursor.execute('CREATE INDEX IF NOT EXISTS idx_filtered_messages_confidence ON filtered_messages(confidence)')
             await cursor.execute('CREATE INDEX IF NOT EXISTS idx_filtered_messages_used ON filtered_messages(used_for_learning)')
+            await cursor.execute('CREATE INDEX IF NOT EXISTS idx_filtered_messages_group_ts ON filtered_messages(group_id, timestamp DESC)')
             await cursor.execute('CREATE INDEX IF NOT EXISTS idx_persona_update_records_status ON persona_update_records(status)')
             await cursor.execute('CREATE INDEX IF NOT EXISTS idx_persona_update_records_group_id ON persona_update_records(group_id)')
             
@@ -597,6 +634,47 @@ class DatabaseManager(AsyncServiceBase):
             logger.error(f"保存原始消息失败: {e}", exc_info=True)
             raise DataStorageError(f"保存原始消息失败: {str(e)}")
 
+    async def save_raw_messages_batch(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        在单个事务中批量保存原始消息到全局消息数据库
+        
+        Args:
+            messages: 原始消息数据列表
+            
+        Returns:
+            写入的消息数量
+        """
+        if not messages:
+            return 0
+            
+        conn = await self._get_messages_db_connection()
+        
+        rows = [(
+            msg.get('sender_id'),
+            msg.get('sender_name'),
+            msg.get('message'),
+            msg.get('group_id'),
+            msg.get('platform'),
+            msg.get('timestamp')
+        ) for msg in messages]
+        
+        try:
+            # aiosqlite 的每个连接都在自己的专用线程上串行执行，这里不会阻塞事件循环；
+            # 直接在连接上 executemany，省去单独创建游标的一次线程往返
+            await conn.executemany('''
+                INSERT INTO raw_messages (sender_id, sender_name, message, group_id, platform, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            
+            await conn.commit()
+            logger.debug(f"已批量保存 {len(rows)} 条原始消息")
+            return len(rows)
+            
+        except aiosqlite.Error as e:
+            await conn.rollback()
+            logger.error(f"批量保存原始消息失败: {e}", exc_info=True)
+            raise DataStorageError(f"批量保存原始消息失败: {str(e)}")
+
     async def get_unprocessed_messages(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         获取未处理的原始消息
@@ -607,6 +685,9 @@ class DatabaseManager(AsyncServiceBase):
         Returns:
             未处理的消息列表
         """
+        # 先写入待合并的已处理标记，避免重复取到刚处理过的消息
+        await self._flush_processed_ids()
+        
         conn = await self._get_messages_db_connection()
         cursor = await conn.cursor()
         
@@ -646,9 +727,61 @@ class DatabaseManager(AsyncServiceBase):
             logger.error(f"获取未处理消息失败: {e}", exc_info=True)
             raise DataStorageError(f"获取未处理消息失败: {str(e)}")
 
+    async def fetch_columns(self, sql: str, params: Sequence[Any], column_count: int) -> Tuple[List[Any], ...]:
+        """
+        执行查询并按列返回结果，不为每行构建字典
+        
+        Args:
+            sql: 查询语句
+            params: 查询参数
+            column_count: 查询结果的列数
+            
+        Returns:
+            每列一个列表组成的元组
+        """
+        try:
+            conn = await self._get_messages_db_connection()
+            cursor = await conn.execute(sql, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            
+            if not rows:
+                return tuple([] for _ in range(column_count))
+            return tuple(list(column) for column in zip(*rows))
+            
+        except Exception as e:
+            logger.error(f"按列查询失败: {e}", exc_info=True)
+            raise DataStorageError(f"按列查询失败: {str(e)}")
+
+    async def export_messages_learning_data(self) -> Dict[str, Any]:
+        """
+        导出学习数据：原始消息和筛选消息均按列导出，并附带统计信息
+        
+        Returns:
+            可直接序列化为JSON的导出数据。raw_messages 与 filtered_messages
+            均为 {列名: 按时间升序排列的值列表} 的形式，同一下标对应同一条消息
+        """
+        raw_cols = ('sender_id', 'sender_name', 'message', 'group_id', 'platform', 'timestamp', 'processed')
+        raw_columns = await self.fetch_columns(
+            f'SELECT {", ".join(raw_cols)} FROM raw_messages ORDER BY timestamp ASC', (), len(raw_cols)
+        )
+        
+        filtered_cols = ('message', 'sender_id', 'group_id', 'confidence', 'timestamp', 'used_for_learning')
+        filtered_columns = await self.fetch_columns(
+            f'SELECT {", ".join(filtered_cols)} FROM filtered_messages ORDER BY timestamp ASC', (), len(filtered_cols)
+        )
+        
+        return {
+            'raw_messages': dict(zip(raw_cols, raw_columns)),
+            'filtered_messages': dict(zip(filtered_cols, filtered_columns)),
+            'statistics': await self.get_messages_statistics(),
+            'export_time': datetime.now().isoformat()
+        }
+
     async def mark_messages_processed(self, message_ids: List[int]) -> bool:
         """
-        标记消息为已处理
+        标记消息为已处理。短时间窗口内的多次调用会合并为一次 UPDATE，
+        返回时本次的标记已经写入数据库。
         
         Args:
             message_ids: 消息ID列表
@@ -658,26 +791,67 @@ class DatabaseManager(AsyncServiceBase):
         """
         if not message_ids:
             return True
-            
-        conn = await self._get_messages_db_connection()
-        cursor = await conn.cursor()
         
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._pending_processed_ids.update(message_ids)
+        self._processed_waiters.append(waiter)
+        
+        if self._processed_flush_handle is None:
+            self._processed_flush_handle = loop.call_later(self._processed_flush_delay, self._on_processed_flush_timer)
+        
+        return await waiter
+
+    def _on_processed_flush_timer(self):
+        """合并窗口到期，后台写入待处理的已处理标记"""
+        self._processed_flush_handle = None
+        self._processed_flush_task = asyncio.create_task(self._flush_processed_ids_quietly())
+
+    async def _flush_processed_ids_quietly(self):
+        """后台写入已处理标记，错误已通过等待者传递给调用方"""
         try:
-            # 批量更新消息状态
-            placeholders = ','.join(['?' for _ in message_ids])
-            await cursor.execute(f'''
-                UPDATE raw_messages 
-                SET processed = TRUE 
-                WHERE id IN ({placeholders})
-            ''', message_ids)
-            
-            await conn.commit()
-            logger.debug(f"已标记 {len(message_ids)} 条消息为已处理")
-            return True
-            
-        except aiosqlite.Error as e:
-            logger.error(f"标记消息处理状态失败: {e}", exc_info=True)
-            raise DataStorageError(f"标记消息处理状态失败: {str(e)}")
+            await self._flush_processed_ids()
+        except DataStorageError:
+            pass
+
+    async def _flush_processed_ids(self):
+        """将合并的已处理标记一次性写入数据库，并通知所有等待的调用方"""
+        async with self._processed_flush_lock:
+            if self._processed_flush_handle is not None:
+                self._processed_flush_handle.cancel()
+                self._processed_flush_handle = None
+            
+            if not self._pending_processed_ids:
+                return
+            
+            message_ids, self._pending_processed_ids = self._pending_processed_ids, set()
+            waiters, self._processed_waiters = self._processed_waiters, []
+            
+            try:
+                conn = await self._get_messages_db_connection()
+                cursor = await conn.cursor()
+                
+                # 批量更新消息状态（ID列表以JSON传入，SQL文本固定，可复用缓存的预编译语句）
+                await cursor.execute('''
+                    UPDATE raw_messages 
+                    SET processed = TRUE 
+                    WHERE id IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(list(message_ids)),))
+                
+                await conn.commit()
+                logger.debug(f"已标记 {len(message_ids)} 条消息为已处理")
+                
+            except Exception as e:
+                logger.error(f"标记消息处理状态失败: {e}", exc_info=True)
+                error = DataStorageError(f"标记消息处理状态失败: {str(e)}")
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(error)
+                raise error
+            
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(True)
 
     async def add_filtered_message(self, filtered_data: Dict[str, Any]) -> int:
         """
@@ -689,10 +863,10 @@ class DatabaseManager(AsyncServiceBase):
         Returns:
             筛选消息的ID
         """
-        conn = await self._get_messages_db_connection()
-        cursor = await conn.cursor()
-        
         try:
+            conn = await self._get_messages_db_connection()
+            cursor = await conn.cursor()
+            
             await cursor.execute('''
                 INSERT INTO filtered_messages 
                 (raw_message_id, message, sender_id, confidence, filter_reason, timestamp, quality_scores, group_id)
@@ -713,7 +887,7 @@ class DatabaseManager(AsyncServiceBase):
             logger.debug(f"筛选消息已保存，ID: {filtered_id}")
             return filtered_id
             
-        except aiosqlite.Error as e:
+        except Exception as e:
             logger.error(f"添加筛选消息失败: {e}", exc_info=True)
             raise DataStorageError(f"添加筛选消息失败: {str(e)}")
 
@@ -727,10 +901,10 @@ class DatabaseManager(AsyncServiceBase):
         Returns:
             筛选消息列表
         """
-        conn = await self._get_messages_db_connection()
-        cursor = await conn.cursor()
-        
         try:
+            conn = await self._get_messages_db_connection()
+            cursor = await conn.cursor()
+            
             if limit:
                 await cursor.execute('''
                     SELECT id, message, sender_id, confidence, quality_scores, timestamp, group_id
@@ -768,7 +942,7 @@ class DatabaseManager(AsyncServiceBase):
             
             return messages
             
-        except aiosqlite.Error as e:
+        except Exception as e:
             logger.error(f"获取学习消息失败: {e}", exc_info=True)
             raise DataStorageError(f"获取学习消息失败: {str(e)}")
 
@@ -783,10 +957,10 @@ class DatabaseManager(AsyncServiceBase):
         Returns:
             筛选消息列表
         """
-        conn = await self._get_messages_db_connection()
-        cursor = await conn.cursor()
-        
         try:
+            conn = await self._get_messages_db_connection()
+            cursor = await conn.cursor()
+            
             await cursor.execute('''
                 SELECT id, message, sender_id, confidence, quality_scores, timestamp
                 FROM filtered_messages 
@@ -815,10 +989,46 @@ class DatabaseManager(AsyncServiceBase):
             
             return messages
             
-        except aiosqlite.Error as e:
+        except Exception as e:
             logger.error(f"获取最近筛选消息失败: {e}", exc_info=True)
             return []
 
+    async def get_timestamp_summary(self, group_id: Optional[str] = None) -> Tuple[int, Optional[float]]:
+        """
+        获取原始消息的数量和最新时间戳，用于判断时间戳统计缓存是否仍然有效
+        
+        Args:
+            group_id: 群组ID，为空时统计全部消息
+            
+        Returns:
+            (消息数量, 最新时间戳)
+        """
+        if group_id:
+            sql, params = 'SELECT COUNT(*), MAX(timestamp) FROM raw_messages WHERE group_id = ?', (group_id,)
+        else:
+            sql, params = 'SELECT COUNT(*), MAX(timestamp) FROM raw_messages', ()
+        
+        count, max_timestamp = await self.fetch_columns(sql, params, 2)
+        return count[0], max_timestamp[0]
+
+    async def get_timestamp_array(self, group_id: Optional[str] = None) -> np.ndarray:
+        """
+        获取原始消息的时间戳列
+        
+        Args:
+            group_id: 群组ID，为空时获取全部消息
+            
+        Returns:
+            float64 的 NumPy 数组
+        """
+        if group_id:
+            sql, params = 'SELECT timestamp FROM raw_messages WHERE group_id = ?', (group_id,)
+        else:
+            sql, params = 'SELECT timestamp FROM raw_messages', ()
+        
+        (timestamps,) = await self.fetch_columns(sql, params, 1)
+        return np.fromiter(timestamps, dtype=np.float64, count=len(timestamps))
+
     async def get_messages_statistics(self) -> Dict[str, Any]:
         """
         获取消息统计信息
@@ -2,8 +2,8 @@
 消息收集服务 - 负责收集、存储和管理用户消息数据
 """
 import asyncio
-import time
-from typing import List, Dict, Optional, Any
+import numpy as np
+from typing import List, Dict, Optional, Any, Awaitable, Tuple
 from datetime import datetime, timedelta
 
 from astrbot.api import logger
@@ -12,6 +12,53 @@ from astrbot.api.star import Context
 from ..config import PluginConfig
 from ..exceptions import MessageCollectionError, DataStorageError
 from .database_manager import DatabaseManager
+from ..utils.json_utils import dumps_json_bytes
+
+
+# 收集消息时必须包含的字段
+_REQUIRED_FIELDS = frozenset(('sender_id', 'message', 'timestamp'))
+
+
+def _compute_timestamp_statistics(timestamps: np.ndarray) -> Dict[str, Any]:
+    """用 NumPy 向量化计算消息时间分布：按小时分布、日均消息数和消息间隔分位数"""
+    if timestamps.size == 0:
+        return {}
+    
+    # 按本地时区计算一天中的小时
+    utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+    hours = (((timestamps + utc_offset) % 86400) // 3600).astype(np.int64)
+    hourly_distribution = np.bincount(hours, minlength=24)
+    
+    first_time = float(timestamps.min())
+    last_time = float(timestamps.max())
+    days = max((last_time - first_time) / 86400, 1.0)
+    
+    result = {
+        'hourly_distribution': hourly_distribution.tolist(),
+        'peak_hour': int(np.argmax(hourly_distribution)),
+        'first_message_time': first_time,
+        'last_message_time': last_time,
+        'avg_messages_per_day': float(timestamps.size / days)
+    }
+    
+    if timestamps.size > 1:
+        intervals = np.diff(np.sort(timestamps))
+        p50, p90, p99 = np.quantile(intervals, [0.5, 0.9, 0.99])
+        result['interval_quantiles'] = {'p50': float(p50), 'p90': float(p90), 'p99': float(p99)}
+        result['avg_interval'] = float(intervals.mean())
+    
+    return result
+
+
+class _Completed:
+    """无需等待的可等待对象，await 时立即返回，不依赖事件循环"""
+    __slots__ = ()
+
+    def __await__(self):
+        return iter(())
+
+
+_COMPLETED = _Completed()
 
 
 class MessageCollectorService:
@@ -22,33 +69,41 @@ class MessageCollectorService:
         self.context = context
         self.database_manager = database_manager # 注入数据库管理器
         
-        # 消息缓存（用于批量写入优化）
-        self._message_cache = []
+        # 消息队列（用于批量写入优化），由后台刷新任务消费
         self._cache_size_limit = 100
-        self._last_flush_time = time.time()
         self._flush_interval = 30  # 30秒强制刷新一次
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self._cache_size_limit * 4)
+        self._flush_event = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._stopping = False  # 为 True 时后台刷新任务在完成当前批次后退出
+        self._timer_handle: Optional[asyncio.TimerHandle] = None
+        self._pending: List[Dict[str, Any]] = []  # 写库失败、等待重试的消息
+        self._flush_lock = asyncio.Lock()  # 串行化批量写入，保证失败批次按顺序重试
+        # group_id -> ((消息数量, 最新时间戳), 时间分布统计)
+        self._timestamp_stats_cache: Dict[Optional[str], Tuple[Tuple[int, Optional[float]], Dict[str, Any]]] = {}
         
         logger.info("消息收集服务初始化完成")
 
     # 移除 _init_database 方法，因为数据库初始化现在由 DatabaseManager 负责
 
     async def collect_message(self, message_data: Dict[str, Any]) -> bool:
-        """收集消息到缓存"""
+        """收集消息到队列"""
         try:
             # 验证消息数据
-            required_fields = ['sender_id', 'message', 'timestamp']
-            for field in required_fields:
-                if field not in message_data:
-                    logger.warning(f"消息数据缺少必要字段: {field}")
-                    return False
+            missing = _REQUIRED_FIELDS.difference(message_data)
+            if missing:
+                logger.warning(f"消息数据缺少必要字段: {', '.join(sorted(missing))}")
+                return False
+            
+            self._ensure_flusher()
             
-            # 添加到缓存
-            self._message_cache.append(message_data)
+            # 添加到队列，写库由后台刷新任务完成
+            await self._queue.put(message_data)
+            self._arm_timer()
             
-            # 检查是否需要刷新缓存
-            if (len(self._message_cache) >= self._cache_size_limit or 
-                time.time() - self._last_flush_time > self._flush_interval):
-                await self._flush_message_cache()
+            # 达到批量阈值时唤醒刷新任务
+            if self._queue.qsize() >= self._cache_size_limit:
+                self._flush_event.set()
             
             return True
             
@@ -56,21 +111,67 @@ class MessageCollectorService:
             logger.error(f"消息收集失败: {e}")
             raise MessageCollectionError(f"消息收集失败: {str(e)}")
 
-    async def _flush_message_cache(self):
-        """刷新消息缓存到数据库"""
-        if not self._message_cache:
-            return
+    def _ensure_flusher(self):
+        """在事件循环中按需启动后台刷新任务"""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._stopping = False
+            self._flusher_task = asyncio.create_task(self._flusher_loop())
+
+    def _arm_timer(self):
+        """有待写入的消息时安排一次定时刷新；已安排则不重复"""
+        if self._timer_handle is None:
+            self._timer_handle = asyncio.get_running_loop().call_later(self._flush_interval, self._on_timer)
+
+    def _on_timer(self):
+        """定时器到期，唤醒刷新任务"""
+        self._timer_handle = None
+        self._flush_event.set()
+
+    async def _flusher_loop(self):
+        """后台刷新任务：达到批量阈值或定时器到期时，将队列中的消息批量写入数据库"""
+        while not self._stopping:
+            await self._flush_event.wait()
+            self._flush_event.clear()
+            if self._stopping:
+                break
             
-        try:
-            # 并发插入消息
-            tasks = [self.database_manager.save_raw_message(msg) for msg in self._message_cache]
-            await asyncio.gather(*tasks)
+            try:
+                await self._drain_queue()
+            except Exception as e:
+                logger.error(f"后台消息刷新失败: {e}")
+                # 失败的批次保留在 _pending 中，到期后再次重试
+                self._arm_timer()
+
+    async def _drain_queue(self):
+        """取出队列中的全部消息，连同此前写入失败的消息一起批量写入数据库"""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            if not batch:
+                return
             
-            logger.debug(f"已刷新 {len(self._message_cache)} 条消息到数据库")
+            try:
+                # 单事务批量插入消息
+                await self.database_manager.save_raw_messages_batch(batch)
+            except Exception:
+                # 写入失败时保留整批消息，下次刷新时重试
+                self._pending = batch
+                raise
             
-            # 清空缓存
-            self._message_cache.clear()
-            self._last_flush_time = time.time()
+            logger.debug(f"已刷新 {len(batch)} 条消息到数据库")
+
+    def _flush_message_cache(self) -> Awaitable[None]:
+        """刷新消息队列到数据库；没有待写入或正在写入的消息时直接返回已完成的可等待对象"""
+        if self._queue.empty() and not self._pending and not self._flush_lock.locked():
+            return _COMPLETED
+        return self._flush_impl()
+
+    async def _flush_impl(self):
+        """刷新消息队列到数据库（会先等待后台任务正在写入的批次完成）"""
+        try:
+            await self._drain_queue()
             
         except Exception as e:
             logger.error(f"消息缓存刷新失败: {e}")
@@ -89,50 +190,27 @@ class MessageCollectorService:
             logger.error(f"获取未处理消息失败: {e}")
             raise DataStorageError(f"获取未处理消息失败: {str(e)}")
 
-    async def add_filtered_message(self, filtered_data: Dict[str, Any]) -> bool:
-        """添加筛选后的消息"""
-        try:
-            await self.database_manager.add_filtered_message(filtered_data)
-            return True
-            
-        except Exception as e:
-            logger.error(f"添加筛选消息失败: {e}")
-            raise DataStorageError(f"添加筛选消息失败: {str(e)}")
+    # 以下方法直接返回数据库协程，由调用方 await；
+    # DatabaseManager 的对应方法会记录所有异常并转换为 DataStorageError
+    # （get_recent_filtered_messages 出错时返回空列表），因此无需再包一层协程
 
-    async def mark_messages_processed(self, message_ids: List[int]):
+    def add_filtered_message(self, filtered_data: Dict[str, Any]) -> Awaitable[int]:
+        """添加筛选后的消息，返回筛选消息ID"""
+        return self.database_manager.add_filtered_message(filtered_data)
+
+    def mark_messages_processed(self, message_ids: List[int]) -> Awaitable[bool]:
         """标记消息为已处理"""
-        try:
-            if not message_ids:
-                return
-            
-            await self.database_manager.mark_messages_processed(message_ids)
-            logger.debug(f"已标记 {len(message_ids)} 条消息为已处理")
-            
-        except Exception as e:
-            logger.error(f"标记消息处理状态失败: {e}")
-            raise DataStorageError(f"标记消息处理状态失败: {str(e)}")
+        return self.database_manager.mark_messages_processed(message_ids)
 
-    async def get_filtered_messages_for_learning(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_filtered_messages_for_learning(self, limit: Optional[int] = None) -> Awaitable[List[Dict[str, Any]]]:
         """获取用于学习的筛选消息"""
-        try:
-            messages = await self.database_manager.get_filtered_messages_for_learning(limit)
-            return messages
-            
-        except Exception as e:
-            logger.error(f"获取学习消息失败: {e}")
-            raise DataStorageError(f"获取学习消息失败: {str(e)}")
+        return self.database_manager.get_filtered_messages_for_learning(limit)
 
-    async def get_recent_filtered_messages(self, group_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def get_recent_filtered_messages(self, group_id: str, limit: int = 5) -> Awaitable[List[Dict[str, Any]]]:
         """
         获取指定群组最近的、包含多维度评分的筛选消息。
         """
-        try:
-            messages = await self.database_manager.get_recent_filtered_messages(group_id, limit)
-            return messages
-
-        except Exception as e:
-            logger.error(f"获取最近筛选消息失败: {e}")
-            return []
+        return self.database_manager.get_recent_filtered_messages(group_id, limit)
 
     async def get_statistics(self, group_id: Optional[str] = None) -> Dict[str, Any]:
         """获取收集统计信息"""
@@ -146,21 +224,40 @@ class MessageCollectorService:
             else:
                 statistics = await self.database_manager.get_messages_statistics()
             
-            statistics['cache_size'] = len(self._message_cache) # 缓存大小仍然由 MessageCollectorService 管理
+            statistics['cache_size'] = self._queue.qsize() + len(self._pending) # 缓存大小仍然由 MessageCollectorService 管理
+            
+            # 时间分布统计失败时只跳过这一项，不影响基础统计
+            try:
+                statistics['timestamp_statistics'] = await self._get_timestamp_statistics(group_id)
+            except Exception as e:
+                logger.warning(f"获取消息时间分布统计失败: {e}")
+            
             return statistics
             
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {}
 
-    async def export_learning_data(self) -> Dict[str, Any]:
-        """导出学习数据"""
+    async def _get_timestamp_statistics(self, group_id: Optional[str]) -> Dict[str, Any]:
+        """获取消息时间分布统计；消息数量和最新时间戳未变化时直接返回缓存结果"""
+        cache_key = await self.database_manager.get_timestamp_summary(group_id)
+        cached = self._timestamp_stats_cache.get(group_id)
+        if cached and cached[0] == cache_key:
+            return cached[1]
+        
+        timestamps = await self.database_manager.get_timestamp_array(group_id)
+        result = _compute_timestamp_statistics(timestamps)
+        self._timestamp_stats_cache[group_id] = (cache_key, result)
+        return result
+
+    async def export_learning_data(self) -> bytes:
+        """导出学习数据，返回序列化后的JSON字节串"""
         try:
             await self._flush_message_cache()
             
             learning_data = await self.database_manager.export_messages_learning_data()
             learning_data['config'] = self.config.to_dict() # 配置信息仍然由 MessageCollectorService 提供
-            return learning_data
+            return dumps_json_bytes(learning_data)
             
         except Exception as e:
             logger.error(f"导出学习数据失败: {e}")
@@ -171,7 +268,6 @@ class MessageCollectorService:
         try:
             await self._flush_message_cache()
             await self.database_manager.clear_all_messages_data()
-            self._message_cache.clear()
             logger.info("所有学习数据已清空")
             
         except Exception as e:
@@ -187,29 +283,23 @@ class MessageCollectorService:
         except Exception as e:
             logger.error(f"保存状态失败: {e}")
 
-    async def create_learning_batch(self, batch_name: str) -> int:
-        """创建学习批次记录"""
-        try:
-            batch_id = await self.database_manager.create_learning_batch(batch_name)
-            return batch_id
-            
-        except Exception as e:
-            logger.error(f"创建学习批次失败: {e}")
-            raise DataStorageError(f"创建学习批次失败: {str(e)}")
-
-    async def update_learning_batch(self, batch_id: int, **kwargs):
-        """更新学习批次信息"""
-        try:
-            await self.database_manager.update_learning_batch(batch_id, **kwargs)
-            
-        except Exception as e:
-            logger.error(f"更新学习批次失败: {e}")
-            raise DataStorageError(f"更新学习批次失败: {str(e)}")
-
     async def stop(self):
         """停止服务，保存状态"""
         try:
+            # 先让后台刷新任务完成手头的批次后退出，而不是取消它，避免丢失已取出的消息
+            if self._flusher_task:
+                self._stopping = True
+                self._flush_event.set()
+                await self._flusher_task
+                self._flusher_task = None
+            
+            if self._timer_handle:
+                self._timer_handle.cancel()
+                self._timer_handle = None
+            
+            # 剩余消息由最终刷新写入
             await self.save_state()
+            
             logger.info("消息收集服务已停止")
             return True
         except Exception as e:
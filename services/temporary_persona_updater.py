@@ -18,6 +18,7 @@ from ..services.database_manager import DatabaseManager
 from ..statics.temp_persona_messages import TemporaryPersonaMessages
 from ..statics.prompts import MULTIDIMENSIONAL_ANALYZER_FILTER_MESSAGE_PROMPT
 from ..exceptions import SelfLearningError
+from ..utils.json_utils import dumps_json_bytes
 
 
 class TemporaryPersonaUpdater:
@@ -108,8 +109,8 @@ class TemporaryPersonaUpdater:
             }
             
             # 写入备份文件（txt格式，JSON内容）
-            with open(backup_file_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
+            with open(backup_file_path, 'wb') as f:
+                f.write(dumps_json_bytes(backup_data))
             
             # 同时在数据库中记录备份
             await self.backup_manager.create_backup_before_update(group_id, reason)
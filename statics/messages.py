@@ -186,6 +186,8 @@ class FileNames:
     """文件和路径名称"""
     PASSWORD_CONFIG_FILE = "password.json"
     CONFIG_FILE = "config.json"
+    # 导出文件为 JSON：raw_messages / filtered_messages 按列存储（{列名: 值列表}，同一下标为同一条消息），
+    # 另含 statistics、export_time 和 config
     EXPORT_FILENAME_TEMPLATE = "learning_data_export_{timestamp}.json"
     DB_GROUP_FILE_TEMPLATE = "{group_id}_ID.db"
     MESSAGES_DB_FILE = "messages.db"
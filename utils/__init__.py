@@ -1,6 +1,6 @@
 """
 工具模块 - 提供通用工具函数
 """
-from .json_utils import clean_llm_json_response, safe_parse_llm_json, safe_json_loads_with_fallback
+from .json_utils import clean_llm_json_response, safe_parse_llm_json, safe_json_loads_with_fallback, dumps_json_bytes
 
-__all__ = ['clean_llm_json_response', 'safe_parse_llm_json', 'safe_json_loads_with_fallback']
\ No newline at end of file
+__all__ = ['clean_llm_json_response', 'safe_parse_llm_json', 'safe_json_loads_with_fallback', 'dumps_json_bytes']
\ No newline at end of file
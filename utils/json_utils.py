@@ -5,9 +5,30 @@ import json
 import re
 from typing import Any, Optional
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from astrbot.api import logger
 
 
+def dumps_json_bytes(data: Any) -> bytes:
+    """
+    将数据序列化为缩进格式的UTF-8 JSON字节串，安装了 orjson 时使用 orjson 加速
+    
+    Args:
+        data: 待序列化的数据
+        
+    Returns:
+        JSON字节串（不转义非ASCII字符）
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
 def clean_llm_json_response(response_text: str) -> str:
     """
     清理LLM响应中的markdown标识符和其他格式化字符